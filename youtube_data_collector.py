@@ -1,31 +1,418 @@
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import pandas as pd
+from googleapiclient.model import JsonModel
+import csv
+from collections import namedtuple
+import functools
+import gzip
+from operator import itemgetter
 import os
+import random
+import re
+import sqlite3
 from datetime import datetime
-import isodate
 import json
 from tqdm import tqdm
 import time
-from youtube_transcript_api import YouTubeTranscriptApi
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from youtube_transcript_api import (
+    NoTranscriptFound,
+    TranscriptsDisabled,
+    VideoUnavailable,
+    YouTubeTranscriptApi,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Output columns as (header, VideoRow field), in output order. Both the
+# headers and the VideoRow fields are built from this one list.
+COLUMNS = [
+    ("Video URL", "video_url"),
+    ("Title", "title"),
+    ("Description", "description"),
+    ("Channel Title", "channel_title"),
+    ("Keyword Tags", "keyword_tags"),
+    ("YouTube Video Category", "category_id"),
+    ("Video Published at", "published_at"),
+    ("Video Duration", "duration"),
+    ("View Count", "view_count"),
+    ("Comment Count", "comment_count"),
+    ("Captions Available", "captions_available"),
+    ("Caption Text", "caption_text"),
+]
+
+FIELDNAMES = [header for header, _ in COLUMNS]
+
+# One output row. A tuple keeps the per-video footprint small and lets the
+# writers take rows positionally.
+VideoRow = namedtuple("VideoRow", [field for _, field in COLUMNS])
+
+# Partial-response selector for videos.list, only the fields we store
+VIDEO_FIELDS = (
+    "items(id,snippet(title,description,channelTitle,tags,categoryId,publishedAt),"
+    "contentDetails(duration,caption),statistics(viewCount,commentCount))"
+)
+
+# YouTube durations are a small subset of ISO-8601, e.g. PT1H2M3S or P1DT2H
+DURATION_RE = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = (429, 500, 503)
+
+# Rows buffered by the parquet/feather writers before a row group is written
+ARROW_BATCH_ROWS = 5000
+
+# Narrow column types for the columnar (parquet/feather) outputs
+COLUMN_TYPES = {
+    "View Count": "int64",
+    "Comment Count": "int64",
+    "Captions Available": "bool",
+}
+
+
+class CSVRowWriter:
+    """
+    Stream video rows to a CSV file as they are collected
+    """
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.file = self.open_file(output_file)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(FIELDNAMES)
+
+    def open_file(self, output_file):
+        return open(output_file, "w", newline="", encoding="utf-8", buffering=1 << 20)
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class GzipCSVRowWriter(CSVRowWriter):
+    def open_file(self, output_file):
+        return gzip.open(
+            output_file, "wt", newline="", encoding="utf-8", compresslevel=3
+        )
+
+
+class ArrowRowWriter:
+    """
+    Buffer video rows and write them out as Arrow record batches. Rows are
+    held until ARROW_BATCH_ROWS have accumulated, so a typical run ends up
+    as a single parquet row group; a parquet or feather file is unreadable
+    without its footer anyway, so per-batch flushes would buy no crash
+    safety. Subclasses open self.writer (parquet or feather).
+    """
+
+    def __init__(self, output_file):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(
+                "pyarrow is required for parquet and feather output, install it "
+                'or pass fmt="csv"'
+            ) from None
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [(name, COLUMN_TYPES.get(name, "string")) for name in FIELDNAMES]
+        )
+        self.output_file = output_file
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+    def write_rows(self):
+        if self.rows:
+            columns = [
+                self.pa.array(values, type=field.type)
+                for values, field in zip(zip(*self.rows), self.schema)
+            ]
+            batch = self.pa.RecordBatch.from_arrays(columns, schema=self.schema)
+            self.writer.write_batch(batch)
+            self.rows = []
+
+    def flush(self):
+        if len(self.rows) >= ARROW_BATCH_ROWS:
+            self.write_rows()
+
+    def close(self):
+        self.write_rows()
+        self.writer.close()
+
+
+class ParquetRowWriter(ArrowRowWriter):
+    def __init__(self, output_file):
+        super().__init__(output_file)
+        import pyarrow.parquet as pq
+
+        self.writer = pq.ParquetWriter(output_file, self.schema, compression="zstd")
+
+
+class FeatherRowWriter(ArrowRowWriter):
+    def __init__(self, output_file):
+        super().__init__(output_file)
+        options = self.pa.ipc.IpcWriteOptions(compression="zstd")
+        self.writer = self.pa.ipc.new_file(output_file, self.schema, options=options)
+
+
+class OrjsonModel(JsonModel):
+    """
+    googleapiclient response model that parses JSON bodies with orjson
+    """
+
+    def deserialize(self, content):
+        try:
+            body = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().deserialize(content)
+        if self._data_wrapper and "data" in body:
+            body = body["data"]
+        return body
+
+
+class JsonLinesRowWriter:
+    """
+    Append video rows to a JSON Lines file, one JSON object per line
+    """
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.file = open(output_file, "ab", buffering=1 << 20)
+
+    def writerow(self, row):
+        # JSON objects need the headers as keys, so this output still builds
+        # a dict per row; it is only paid when jsonl output is enabled
+        row = dict(zip(FIELDNAMES, row))
+        if orjson is not None:
+            self.file.write(orjson.dumps(row))
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+        self.file.write(b"\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class TeeRowWriter:
+    """
+    Write every row to several row writers at once
+    """
+
+    def __init__(self, writers):
+        self.writers = writers
+
+    def writerow(self, row):
+        for writer in self.writers:
+            writer.writerow(row)
+
+    def flush(self):
+        for writer in self.writers:
+            writer.flush()
+
+    def close(self):
+        # Close every writer even if one fails, then report the first error
+        error = None
+        for writer in self.writers:
+            try:
+                writer.close()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+
+class TranscriptCache:
+    """
+    On-disk cache of caption results keyed by video ID, shared by the
+    caption worker threads. Entries older than ttl seconds are refetched.
+    """
+
+    def __init__(self, path, ttl=None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "video_id TEXT PRIMARY KEY, ok INTEGER, text TEXT, fetched_at REAL)"
+        )
+
+    def get(self, video_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT ok, text, fetched_at FROM transcripts WHERE video_id = ?",
+                (video_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        ok, text, fetched_at = row
+        if self.ttl is not None and time.time() - fetched_at > self.ttl:
+            return None
+        return bool(ok), text
+
+    def set(self, video_id, ok, text):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?)",
+                (video_id, int(ok), text, time.time()),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def cached_captions(fetch):
+    """
+    Serve caption lookups from the collector's transcript cache when it is
+    open. Only definitive results are stored: any exception raised by fetch
+    (network errors, rate limiting) is reported as no captions for this run
+    and retried on the next one.
+    """
+
+    @functools.wraps(fetch)
+    def wrapper(self, video_id):
+        cache = self.transcript_cache
+        if cache is not None:
+            result = cache.get(video_id)
+            if result is not None:
+                return result
+        try:
+            result = fetch(self, video_id)
+        except Exception:
+            return False, ""
+        if cache is not None:
+            cache.set(video_id, *result)
+        return result
+
+    return wrapper
+
+
+def with_backoff(call, max_tries=5):
+    """
+    Run an API call, retrying with exponential backoff when YouTube answers
+    with a rate-limit or transient server error
+    """
+    for attempt in range(max_tries):
+        try:
+            return call()
+        except HttpError as e:
+            if e.resp.status not in RETRYABLE_STATUSES or attempt == max_tries - 1:
+                raise
+            time.sleep(2**attempt + random.random())
+
+
+def format_duration(duration):
+    """
+    Format a YouTube ISO-8601 duration as H:MM:SS. Durations outside the
+    subset YouTube uses (e.g. weeks) are returned unchanged.
+    """
+    match = DURATION_RE.fullmatch(duration)
+    if match is None:
+        return duration
+    days, hours, minutes, seconds = (int(x or 0) for x in match.groups())
+    return f"{days * 24 + hours}:{minutes:02d}:{seconds:02d}"
+
+
+# Output formats supported by collect_data, mapped to (file extension, writer)
+OUTPUT_FORMATS = {
+    "parquet": (".parquet", ParquetRowWriter),
+    "feather": (".feather", FeatherRowWriter),
+    "csv": (".csv", CSVRowWriter),
+    "csv.gz": (".csv.gz", GzipCSVRowWriter),
+}
 
 
 class YouTubeDataCollector:
     def __init__(self, api_key):
         try:
             print(f"\nInitializing YouTube API...")
-            self.youtube = build("youtube", "v3", developerKey=api_key)
+            self.api_key = api_key
+            self.youtube = self._new_client()
+            self.transcript_cache = None
+            # Worker threads each get their own client, the underlying
+            # httplib2 connection is not thread-safe
+            self._local = threading.local()
             print("API connection successful!")
         except Exception as e:
             print(f"Error initializing YouTube API: {str(e)}")
             raise
 
+    def _new_client(self):
+        model = OrjsonModel() if orjson is not None else None
+        return build("youtube", "v3", developerKey=self.api_key, model=model)
+
+    def _thread_client(self):
+        if not hasattr(self._local, "youtube"):
+            self._local.youtube = self._new_client()
+        return self._local.youtube
+
+    def _fetch_batches(self, batches):
+        """
+        Fetch metadata for several 50-ID batches in a single batched HTTP
+        request. Returns the response items (or the error) of each batch,
+        in the order the batches were given.
+        """
+        client = self._thread_client()
+        results = [None] * len(batches)
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                results[int(request_id)] = exception
+            else:
+                results[int(request_id)] = response.get("items", [])
+
+        requests = [
+            client.videos().list(
+                part="snippet,contentDetails,statistics",
+                id=",".join(batch_ids),
+                fields=VIDEO_FIELDS,
+            )
+            for batch_ids in batches
+        ]
+        batch_request = client.new_batch_http_request(callback=on_response)
+        for i, request in enumerate(requests):
+            batch_request.add(request, request_id=str(i))
+        with_backoff(batch_request.execute)
+
+        # Retry individual batches that were rate limited inside the batch
+        for i, result in enumerate(results):
+            if (
+                isinstance(result, HttpError)
+                and result.resp.status in RETRYABLE_STATUSES
+            ):
+                try:
+                    results[i] = with_backoff(requests[i].execute).get("items", [])
+                except Exception as e:
+                    results[i] = e
+        return results
+
     def search_videos_by_genre(self, genre, max_results=500):
         """
         Search for videos of a specific genre and collect their IDs globally,
         sorted by view count (most viewed first)
         """
         video_ids = []
+        # Paginated search can repeat videos across pages
+        seen = set()
         next_page_token = None
 
         try:
@@ -44,14 +431,19 @@ class YouTubeDataCollector:
                         order="viewCount",  # Sort by view count
                         regionCode=None,  # No region restriction
                         relevanceLanguage="",  # No language restriction
+                        fields="items/id/videoId,nextPageToken",
                     )
 
-                    search_response = search_request.execute()
+                    search_response = with_backoff(search_request.execute)
 
                     if "items" in search_response:
+                        found = len(video_ids)
                         for item in search_response["items"]:
-                            video_ids.append(item["id"]["videoId"])
-                            pbar.update(1)
+                            video_id = item["id"]["videoId"]
+                            if video_id not in seen:
+                                seen.add(video_id)
+                                video_ids.append(video_id)
+                        pbar.update(len(video_ids) - found)
 
                         if len(video_ids) >= max_results:
                             break
@@ -78,136 +470,251 @@ class YouTubeDataCollector:
             print(f"Error in search: {str(e)}")
             return []
 
+    @cached_captions
     def get_video_captions(self, video_id):
         """
-        Get captions for a video using YouTubeTranscriptApi
+        Get captions for a video using YouTubeTranscriptApi. Videos that
+        definitely have no transcript return (False, ""), transient errors
+        are raised.
         """
         try:
+            # One listing request covers both the English lookup and the
+            # fallback, so neither needs another round-trip before the fetch
             transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
             # Try to get English transcript first
             try:
-                transcript = transcript_list.find_transcript(["en"])
-            except:
+                transcript = transcript_list.find_transcript(["en", "en-US", "en-GB"])
+            except NoTranscriptFound:
                 # If no English, get the first available transcript
-                transcript = transcript_list.find_manually_created_transcript()
+                transcript = next(iter(transcript_list), None)
+                if transcript is None:
+                    return False, ""
 
             caption_data = transcript.fetch()
             # Combine all caption text
-            full_text = " ".join([entry["text"] for entry in caption_data])
+            full_text = " ".join(map(itemgetter("text"), caption_data))
             return True, full_text
-        except Exception as e:
+        except (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable):
             return False, ""
 
-    def get_video_details(self, video_ids):
+    def _fetch_group(self, batches, caption_executor, skip_uncaptioned=False):
+        """
+        Fetch metadata for a group of batches and queue caption fetches for
+        them straight away, so transcripts download while later metadata is
+        still in flight. Returns (items, caption futures) per batch, or
+        (error, None) for batches that failed.
+        """
+        results = []
+        for items in self._fetch_batches(batches):
+            if isinstance(items, Exception):
+                results.append((items, None))
+                continue
+            captions = {}
+            try:
+                for item in items:
+                    # contentDetails.caption only covers uploaded caption
+                    # tracks, so skipping on it also drops videos with
+                    # auto-generated transcripts
+                    if (
+                        skip_uncaptioned
+                        and item["contentDetails"].get("caption") != "true"
+                    ):
+                        continue
+                    captions[item["id"]] = caption_executor.submit(
+                        self.get_video_captions, item["id"]
+                    )
+            except Exception as e:
+                # A malformed item fails only its own batch
+                for future in captions.values():
+                    future.cancel()
+                results.append((e, None))
+                continue
+            results.append((items, captions))
+        return results
+
+    def _write_batch(self, items, captions, writer):
         """
-        Collect detailed information for a list of video IDs
+        Write the rows for one batch of videos.list items once their caption
+        futures have finished. Every row is built before any is written, so
+        a malformed item fails the whole batch without leaving part of it in
+        the output. Returns the number of rows written.
         """
-        video_data = []
+        rows = []
+        for item in items:
+            video_id = item["id"]
+            snippet = item["snippet"]
+            statistics = item["statistics"]
+            caption = captions.get(video_id)
+            has_captions, caption_text = caption.result() if caption else (False, "")
+
+            rows.append(
+                VideoRow(
+                    video_url=f"https://www.youtube.com/watch?v={video_id}",
+                    title=snippet["title"],
+                    description=snippet["description"],
+                    channel_title=snippet["channelTitle"],
+                    keyword_tags=",".join(snippet.get("tags", [])),
+                    category_id=snippet["categoryId"],
+                    published_at=snippet["publishedAt"],
+                    duration=format_duration(item["contentDetails"]["duration"]),
+                    view_count=int(statistics.get("viewCount", 0)),
+                    comment_count=int(statistics.get("commentCount", 0)),
+                    captions_available=has_captions,
+                    caption_text=caption_text if has_captions else "",
+                )
+            )
 
-        try:
-            print(f"\nGetting details for {len(video_ids)} videos")
-            pbar = tqdm(total=len(video_ids), desc="Processing videos")
+        for row in rows:
+            writer.writerow(row)
 
-            # Process in batches of 50 to optimize API calls
-            for i in range(0, len(video_ids), 50):
-                batch_ids = video_ids[i : i + 50]
-                try:
-                    request = self.youtube.videos().list(
-                        part="snippet,contentDetails,statistics", id=",".join(batch_ids)
-                    )
+        # Get each finished batch onto disk
+        writer.flush()
+        return len(rows)
 
-                    response = request.execute()
-
-                    if "items" in response:
-                        for item in response["items"]:
-                            # Check for captions
-                            has_captions, caption_text = self.get_video_captions(
-                                item["id"]
-                            )
-
-                            video_info = {
-                                "Video URL": f"https://www.youtube.com/watch?v={item['id']}",
-                                "Title": item["snippet"]["title"],
-                                "Description": item["snippet"]["description"],
-                                "Channel Title": item["snippet"]["channelTitle"],
-                                "Keyword Tags": ",".join(
-                                    item["snippet"].get("tags", [])
-                                ),
-                                "YouTube Video Category": item["snippet"]["categoryId"],
-                                "Video Published at": item["snippet"]["publishedAt"],
-                                "Video Duration": str(
-                                    isodate.parse_duration(
-                                        item["contentDetails"]["duration"]
-                                    )
-                                ),
-                                "View Count": item["statistics"].get("viewCount", 0),
-                                "Comment Count": item["statistics"].get(
-                                    "commentCount", 0
-                                ),
-                                "Captions Available": has_captions,
-                                "Caption Text": caption_text if has_captions else "",
-                            }
-                            video_data.append(video_info)
-                            pbar.update(1)
+    def get_video_details(self, video_ids, writer, skip_uncaptioned=False):
+        """
+        Collect detailed information for a list of video IDs, writing each
+        row to the given writer as soon as its batch is processed.
+        With skip_uncaptioned=True, transcripts are only fetched for videos
+        with an uploaded caption track (auto-generated ones are missed).
+        Returns the number of rows written.
+        """
+        rows_written = 0
 
-                except Exception as e:
-                    print(f"\nError processing batch: {str(e)}")
-                    continue
+        try:
+            print(f"\nGetting details for {len(video_ids)} videos")
+            pbar = tqdm(
+                total=len(video_ids),
+                desc="Processing videos",
+                mininterval=0.5,
+                smoothing=0.1,
+            )
 
-                # Add a small delay to avoid API quota issues
-                time.sleep(0.1)
+            # Split into batches of 50 (the videos.list limit) and send them
+            # 4 to a batched HTTP request. Groups are fetched concurrently and
+            # feed one shared caption pool, while rows are written here in
+            # search order. The caption pool is the outer one so it shuts
+            # down after the batch workers that submit to it.
+            batches = [video_ids[i : i + 50] for i in range(0, len(video_ids), 50)]
+            groups = [batches[i : i + 4] for i in range(0, len(batches), 4)]
+            with ThreadPoolExecutor(max_workers=20) as caption_executor:
+                with ThreadPoolExecutor(max_workers=8) as batch_executor:
+                    futures = [
+                        batch_executor.submit(
+                            self._fetch_group,
+                            group,
+                            caption_executor,
+                            skip_uncaptioned,
+                        )
+                        for group in groups
+                    ]
+                    for future in futures:
+                        try:
+                            results = future.result()
+                        except Exception as e:
+                            print(f"\nError processing batch: {str(e)}")
+                            continue
+
+                        for items, captions in results:
+                            try:
+                                if isinstance(items, Exception):
+                                    raise items
+                                rows_written += self._write_batch(
+                                    items, captions, writer
+                                )
+                                pbar.update(len(items))
+                            except Exception as e:
+                                print(f"\nError processing batch: {str(e)}")
+                                continue
 
             pbar.close()
-            return video_data
+            return rows_written
 
         except Exception as e:
             print(f"Error in get_video_details: {str(e)}")
-            return []
+            return rows_written
 
-    def collect_data(self, genre):
+    def collect_data(self, genre, fmt="parquet", jsonl=False, skip_uncaptioned=False):
         """
-        Main function to collect all required data
+        Main function to collect all required data.
+        fmt selects the output format: "parquet" (default), "feather", "csv"
+        or "csv.gz". With jsonl=True every row is also appended to a .jsonl
+        file next to the main output. skip_uncaptioned=True saves transcript
+        requests by trusting YouTube's caption flag, at the cost of missing
+        auto-generated captions.
         """
         try:
+            if fmt not in OUTPUT_FORMATS:
+                raise ValueError(f"Unsupported output format: {fmt}")
+            extension, writer_class = OUTPUT_FORMATS[fmt]
+
             start_time = time.time()
             print("\nStarting data collection process...")
 
             # Create output directory
             output_dir = "output"
             os.makedirs(output_dir, exist_ok=True)
+            self.transcript_cache = TranscriptCache(
+                os.path.join(output_dir, ".transcript_cache.db")
+            )
 
-            # Search for videos
-            video_ids = self.search_videos_by_genre(genre)
-
-            if not video_ids:
-                print("No videos found!")
-                return
-
-            # Get video details
-            video_data = self.get_video_details(video_ids)
-
-            if not video_data:
-                print("No video details could be retrieved!")
-                return
-
-            # Save to CSV
+            # Open the output before searching, so a missing writer
+            # dependency fails before any API quota is spent
             safe_genre = "".join(
                 c for c in genre if c.isalnum() or c in (" ", "-", "_")
             ).strip()
-            output_file = os.path.join(
+            output_base = os.path.join(
                 output_dir,
-                f"youtube_{safe_genre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                f"youtube_{safe_genre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
             )
-            df = pd.DataFrame(video_data)
-            df.to_csv(output_file, index=False, encoding="utf-8")
+            writers = []
+            writer = TeeRowWriter(writers)
+            video_ids = []
+            rows_written = 0
+            opened = False
+            try:
+                writers.append(writer_class(output_base + extension))
+                if jsonl:
+                    writers.append(JsonLinesRowWriter(output_base + ".jsonl"))
+                opened = True
+
+                # Search for videos
+                video_ids = self.search_videos_by_genre(genre)
+
+                # Get video details, streaming rows to disk as they arrive
+                if video_ids:
+                    rows_written = self.get_video_details(
+                        video_ids, writer, skip_uncaptioned
+                    )
+            finally:
+                writer.close()
+                # Don't leave empty files behind if an output failed to open
+                if not opened:
+                    for w in writers:
+                        os.remove(w.output_file)
+
+            if not rows_written:
+                if not video_ids:
+                    print("No videos found!")
+                else:
+                    print("No video details could be retrieved!")
+                for w in writers:
+                    os.remove(w.output_file)
+                return
 
             end_time = time.time()
             duration = end_time - start_time
 
             print(f"\nData collection completed!")
-            print(f"Total videos processed: {len(video_data)}")
+            print(f"Total videos processed: {rows_written}")
             print(f"Time taken: {duration/60:.2f} minutes")
-            print(f"Data saved to: {output_file}")
+            for w in writers:
+                print(f"Data saved to: {w.output_file}")
 
         except Exception as e:
             print(f"Error in collect_data: {str(e)}")
+
+        finally:
+            if self.transcript_cache is not None:
+                self.transcript_cache.close()
+                self.transcript_cache = None